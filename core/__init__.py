@@ -5,6 +5,7 @@
 
 from .data_io import (
     load_dicom_series,
+    LoadedVolume,
     save_mask_nifti,
     export_history_to_file,
     get_volume_statistics,
@@ -16,6 +17,7 @@ from .state_manager import UIStateManager, UIState
 
 __all__ = [
     'load_dicom_series',
+    'LoadedVolume',
     'save_mask_nifti',
     'export_history_to_file',
     'get_volume_statistics',
@@ -56,6 +56,10 @@ class ConfigManager:
     def __init__(self, config_path: str = "config.json"):
         self.config_path = Path(config_path)
         self.config = self._load_or_create_config()
+        
+        # Признак изменения конфигурации (сбрасывают потребители,
+        # например кешированный редактор конфигурации)
+        self.dirty = False
     
     def _load_or_create_config(self) -> dict:
         """Загружает или создает конфигурацию по умолчанию"""
@@ -84,6 +88,7 @@ class ConfigManager:
     
     def save(self):
         """Сохраняет текущую конфигурацию"""
+        self.dirty = True
         self._save_config()
     
     # === УПРАВЛЕНИЕ РЕЖИМАМИ ОБРАБОТКИ (CRUD) ===
@@ -5,6 +5,7 @@
 """
 
 import os
+from functools import cached_property
 from pathlib import Path
 from typing import Tuple, Optional, Dict, Any
 from datetime import datetime
@@ -14,17 +15,28 @@ import SimpleITK as sitk
 import nibabel as nib
 
 
-def load_dicom_series(folder_path: str) -> Tuple[np.ndarray, Tuple[float, float, float], 
-                                                  Tuple[float, float, float], Tuple[float, ...]]:
+# Максимальная ширина диапазона значений для перцентилей по гистограмме
+# (65536 покрывает любой 16-битный volume, в т.ч. HU КТ [-1024, 3071])
+HISTOGRAM_PERCENTILE_MAX_BINS = 1 << 16
+
+# Число элементов, гистограмма которых строится за один bincount
+# (bincount работает с intp - 8 байт на элемент временного буфера)
+HISTOGRAM_CHUNK_SIZE = 1 << 22
+
+
+def load_dicom_series(folder_path: str, as_volume: bool = False):
     """
     Загружает DICOM серию из указанной папки.
     
     Args:
         folder_path: Путь к папке с DICOM файлами
+        as_volume: Вернуть LoadedVolume вместо кортежа
         
     Returns:
-        Кортеж из (volume, spacing, origin, direction):
-        - volume: 3D массив numpy с данными изображения
+        LoadedVolume, если as_volume=True, иначе
+        кортеж из (volume, spacing, origin, direction):
+        - volume: 3D массив numpy с данными изображения (только для чтения,
+          без копирования буфера SimpleITK)
         - spacing: Размер вокселя (x, y, z) в мм
         - origin: Координаты начала координат (x, y, z)
         - direction: Матрица направления (9 элементов)
@@ -36,6 +48,9 @@ def load_dicom_series(folder_path: str) -> Tuple[np.ndarray, Tuple[float, float,
     Example:
         >>> volume, spacing, origin, direction = load_dicom_series("/path/to/dicom")
         >>> print(f"Loaded volume shape: {volume.shape}")
+        
+        >>> loaded = load_dicom_series("/path/to/dicom", as_volume=True)
+        >>> print(loaded.stats['mean'])
     """
     if not os.path.exists(folder_path):
         raise ValueError(f"Путь не существует: {folder_path}")
@@ -53,21 +68,72 @@ def load_dicom_series(folder_path: str) -> Tuple[np.ndarray, Tuple[float, float,
     except Exception as e:
         raise RuntimeError(f"Не удалось загрузить DICOM серию: {str(e)}")
     
-    volume = sitk.GetArrayFromImage(image)
+    volume = np.asarray(_ImageArrayView(image))
     spacing = image.GetSpacing()
     origin = image.GetOrigin()
     direction = image.GetDirection()
     
+    if as_volume:
+        return LoadedVolume(volume, spacing, origin, direction)
+    
     return volume, spacing, origin, direction
 
 
+class LoadedVolume:
+    """
+    Загруженный volume вместе с геометрией и лениво вычисляемой статистикой.
+    
+    Статистика считается при первом обращении к stats и затем
+    возвращается без пересчета, пока объект жив.
+    
+    Attributes:
+        array: 3D массив numpy с данными изображения
+        spacing: Размер вокселя (x, y, z) в мм
+        origin: Координаты начала координат (x, y, z)
+        direction: Матрица направления (9 элементов)
+    """
+    
+    def __init__(self, array: np.ndarray,
+                 spacing: Tuple[float, float, float],
+                 origin: Tuple[float, float, float],
+                 direction: Tuple[float, ...]):
+        self.array = array
+        self.spacing = spacing
+        self.origin = origin
+        self.direction = direction
+    
+    @cached_property
+    def stats(self) -> Dict[str, Any]:
+        """Статистика volume (см. get_volume_statistics)."""
+        return get_volume_statistics(self.array)
+    
+    def __iter__(self):
+        """Распаковка как у кортежа: volume, spacing, origin, direction = loaded."""
+        return iter((self.array, self.spacing, self.origin, self.direction))
+
+
+class _ImageArrayView:
+    """
+    Держатель SimpleITK изображения для доступа к его буферу без копирования.
+    
+    np.asarray() от этого объекта возвращает массив, у которого .base
+    ссылается на держатель, поэтому буфер изображения живет столько же,
+    сколько сам массив (голый GetArrayViewFromImage этого не гарантирует).
+    """
+    
+    def __init__(self, image: sitk.Image):
+        self._image = image
+        self.__array_interface__ = sitk.GetArrayViewFromImage(image).__array_interface__
+
+
 def save_mask_nifti(mask: np.ndarray,
                     filepath: str,
                     spacing: Tuple[float, float, float],
                     origin: Tuple[float, float, float],
                     direction: Tuple[float, ...],
                     use_compression: bool = False,
-                    prefer_sitk: bool = True) -> bool:
+                    prefer_sitk: bool = True,
+                    compression: str = 'gzip') -> bool:
     """
     Сохраняет маску в формате NIfTI.
     
@@ -79,13 +145,33 @@ def save_mask_nifti(mask: np.ndarray,
         direction: Матрица направления
         use_compression: Использовать сжатие (.nii.gz)
         prefer_sitk: Предпочитать SimpleITK (если False, использовать nibabel)
+        compression: Алгоритм сжатия: 'gzip' (.nii.gz) или 'lz4' - быстрое
+            сжатие Blosc LZ4 + bitshuffle в HDF5 (.h5) вместо NIfTI,
+            когда совместимость с .nii.gz не требуется (нужны h5py и hdf5plugin)
         
     Returns:
         True если сохранение успешно, False иначе
         
     Example:
         >>> success = save_mask_nifti(mask, "output.nii", spacing, origin, direction)
+        >>> success = save_mask_nifti(mask, "output", spacing, origin, direction,
+        ...                           compression='lz4')  # -> output.h5
     """
+    if compression == 'lz4':
+        for ext in ('.nii.gz', '.nii'):
+            if filepath.endswith(ext):
+                filepath = filepath[:-len(ext)]
+                break
+        if not filepath.endswith('.h5'):
+            filepath += '.h5'
+        
+        try:
+            _save_with_blosc(mask, filepath, spacing, origin, direction)
+            return True
+        except Exception as h5_error:
+            print(f"[ERROR] HDF5/Blosc ошибка: {h5_error}")
+            return False
+    
     # Убедимся, что расширение правильное
     if not (filepath.endswith('.nii') or filepath.endswith('.nii.gz')):
         filepath += '.nii.gz' if use_compression else '.nii'
@@ -116,7 +202,7 @@ def _save_with_sitk(mask: np.ndarray,
                     direction: Tuple[float, ...],
                     use_compression: bool) -> None:
     """Сохранение через SimpleITK."""
-    mask_sitk = sitk.GetImageFromArray(mask.astype(np.uint8))
+    mask_sitk = sitk.GetImageFromArray(mask.astype(np.uint8, copy=False))
     mask_sitk.SetSpacing(spacing)
     mask_sitk.SetOrigin(origin)
     mask_sitk.SetDirection(direction)
@@ -129,23 +215,55 @@ def _save_with_nibabel(mask: np.ndarray,
                        origin: Tuple[float, float, float],
                        direction: Tuple[float, ...]) -> None:
     """Сохранение через nibabel."""
-    spacing_arr = np.array(spacing)
-    direction_arr = np.array(direction).reshape(3, 3)
-    origin_arr = np.array(origin)
+    direction_arr = np.asarray(direction, dtype=np.float64).reshape(3, 3)
     
-    # Создаем affine матрицу
+    # Создаем affine матрицу: столбцы направления масштабируются на spacing
     affine = np.eye(4)
-    for i in range(3):
-        for j in range(3):
-            affine[i, j] = direction_arr[i, j] * spacing_arr[j]
-    affine[:3, 3] = origin_arr
-    
-    # nibabel требует транспонирования
-    mask_transposed = mask.transpose(2, 1, 0)
-    nii_img = nib.Nifti1Image(mask_transposed.astype(np.uint8), affine)
+    affine[:3, :3] = direction_arr * np.asarray(spacing, dtype=np.float64)
+    affine[:3, 3] = origin
+    
+    # nibabel требует транспонирования (x, y, z). Транспонированный view
+    # C-непрерывной маски уже имеет Fortran-порядок, в котором NIfTI
+    # хранит данные, поэтому nibabel пишет его без переупорядочивания.
+    # Копия создается только если маска не uint8 или не C-непрерывна.
+    mask_transposed = np.ascontiguousarray(mask, dtype=np.uint8).transpose(2, 1, 0)
+    nii_img = nib.Nifti1Image(mask_transposed, affine)
     nib.save(nii_img, filepath)
 
 
+def _save_with_blosc(mask: np.ndarray,
+                     filepath: str,
+                     spacing: Tuple[float, float, float],
+                     origin: Tuple[float, float, float],
+                     direction: Tuple[float, ...]) -> None:
+    """
+    Сохранение в HDF5 со сжатием Blosc (LZ4 + bitshuffle).
+    
+    Для однобайтовой бинарной маски побайтовый shuffle ничего не дает,
+    а bitshuffle группирует одинаковые биты и резко улучшает сжатие LZ4.
+    
+    Raises:
+        ImportError: Если h5py или hdf5plugin не установлены
+    """
+    try:
+        import h5py
+        import hdf5plugin
+    except ImportError:
+        raise ImportError(
+            "h5py/hdf5plugin не установлены. Установите: pip install h5py hdf5plugin"
+        )
+    
+    compressor = hdf5plugin.Blosc(cname='lz4', clevel=5,
+                                  shuffle=hdf5plugin.Blosc.BITSHUFFLE)
+    
+    with h5py.File(filepath, 'w') as f:
+        dataset = f.create_dataset('mask', data=mask.astype(np.uint8, copy=False),
+                                   chunks=True, **compressor)
+        dataset.attrs['spacing'] = np.asarray(spacing, dtype=np.float64)
+        dataset.attrs['origin'] = np.asarray(origin, dtype=np.float64)
+        dataset.attrs['direction'] = np.asarray(direction, dtype=np.float64)
+
+
 def export_history_to_file(history: list, filepath: str, config: Optional[Dict[str, Any]] = None) -> bool:
     """
     Экспортирует историю операций в текстовый файл.
@@ -154,46 +272,51 @@ def export_history_to_file(history: list, filepath: str, config: Optional[Dict[s
         history: Список записей истории
         filepath: Путь к файлу для сохранения
         config: Опциональный словарь конфигурации
-        
+    
     Returns:
         True если экспорт успешен
-        
+    
     Example:
         >>> history = [{"timestamp": datetime.now(), "message": "Test"}]
         >>> export_history_to_file(history, "history.txt")
     """
     try:
+        separator = "=" * 70 + "\n"
+        
+        # Текст собирается целиком и записывается одним вызовом write()
+        parts = [
+            separator,
+            "LUNG SEGMENTER - ИСТОРИЯ ОПЕРАЦИЙ\n",
+            separator,
+            f"Экспортировано: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+            separator,
+            "\n"
+        ]
+        
+        for entry in history:
+            if isinstance(entry, dict):
+                timestamp = entry.get('timestamp', 'N/A')
+                if isinstance(timestamp, datetime):
+                    timestamp = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+                
+                parts.append(f"[{timestamp}]\n")
+                parts.append(f"Тип: {entry.get('type', 'unknown')}\n")
+                
+                if 'stats' in entry:
+                    parts.append("Статистика:\n")
+                    parts.extend(f"  - {key}: {value}\n" for key, value in entry['stats'].items())
+                
+                parts.append("\n")
+            else:
+                parts.append(f"{entry}\n")
+        
+        parts.extend([separator, "КОНЕЦ ИСТОРИИ\n", separator])
+        
         with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("=" * 70 + "\n")
-            f.write("LUNG SEGMENTER - ИСТОРИЯ ОПЕРАЦИЙ\n")
-            f.write("=" * 70 + "\n")
-            f.write(f"Экспортировано: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 70 + "\n\n")
-            
-            for entry in history:
-                if isinstance(entry, dict):
-                    timestamp = entry.get('timestamp', 'N/A')
-                    if isinstance(timestamp, datetime):
-                        timestamp = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    f.write(f"[{timestamp}]\n")
-                    f.write(f"Тип: {entry.get('type', 'unknown')}\n")
-                    
-                    if 'stats' in entry:
-                        f.write("Статистика:\n")
-                        for key, value in entry['stats'].items():
-                            f.write(f"  - {key}: {value}\n")
-                    
-                    f.write("\n")
-                else:
-                    f.write(f"{entry}\n")
-            
-            f.write("=" * 70 + "\n")
-            f.write("КОНЕЦ ИСТОРИИ\n")
-            f.write("=" * 70 + "\n")
+            f.write(''.join(parts))
         
         return True
-        
+    
     except Exception as e:
         print(f"[ERROR] Не удалось экспортировать историю: {e}")
         return False
@@ -213,17 +336,79 @@ def get_volume_statistics(volume: np.ndarray) -> Dict[str, Any]:
         >>> stats = get_volume_statistics(volume)
         >>> print(f"Min HU: {stats['min']}, Max HU: {stats['max']}")
     """
+    # Сумма и сумма квадратов накапливаются в float64 без создания
+    # временной float-копии volume (np.std строит ее целиком)
+    flat = volume.ravel()
+    n = flat.size
+    total = float(np.add.reduce(flat, dtype=np.float64))
+    total_sq = float(np.einsum('i,i->', flat, flat, dtype=np.float64))
+    mean = total / n
+    variance = max(total_sq / n - mean * mean, 0.0)
+    
+    vmin = volume.min()
+    vmax = volume.max()
+    
+    # Для целочисленных КТ перцентили считаются по гистограмме за один
+    # линейный проход; иначе - одним вызовом np.percentile
+    if (np.issubdtype(volume.dtype, np.integer) and
+            int(vmax) - int(vmin) < HISTOGRAM_PERCENTILE_MAX_BINS):
+        p2, p98 = _histogram_percentiles(flat, int(vmin), int(vmax), (2, 98))
+    else:
+        p2, p98 = np.percentile(volume, [2, 98])
+    
     return {
         'shape': volume.shape,
-        'min': float(np.min(volume)),
-        'max': float(np.max(volume)),
-        'mean': float(np.mean(volume)),
-        'std': float(np.std(volume)),
-        'percentile_2': float(np.percentile(volume, 2)),
-        'percentile_98': float(np.percentile(volume, 98))
+        'min': float(vmin),
+        'max': float(vmax),
+        'mean': mean,
+        'std': float(np.sqrt(variance)),
+        'percentile_2': float(p2),
+        'percentile_98': float(p98)
     }
 
 
+def _histogram_percentiles(flat: np.ndarray, vmin: int, vmax: int,
+                           percentiles: Tuple[float, ...]) -> Tuple[float, ...]:
+    """
+    Точные перцентили целочисленного массива через гистограмму.
+    
+    Результат совпадает с np.percentile (линейная интерполяция), но
+    вместо частичной сортировки используется bincount и кумулятивная сумма.
+    Гистограмма накапливается по блокам HISTOGRAM_CHUNK_SIZE, поэтому
+    временные intp-смещения не превышают размера одного блока.
+    
+    Args:
+        flat: Одномерный целочисленный массив
+        vmin: Минимальное значение массива
+        vmax: Максимальное значение массива
+        percentiles: Перцентили в диапазоне 0-100
+        
+    Returns:
+        Кортеж значений перцентилей
+    """
+    n_bins = vmax - vmin + 1
+    hist = np.zeros(n_bins, dtype=np.intp)
+    offsets = np.empty(min(flat.size, HISTOGRAM_CHUNK_SIZE), dtype=np.intp)
+    for start in range(0, flat.size, HISTOGRAM_CHUNK_SIZE):
+        chunk = flat[start:start + HISTOGRAM_CHUNK_SIZE]
+        chunk_offsets = offsets[:chunk.size]
+        np.subtract(chunk, vmin, out=chunk_offsets, dtype=np.intp)
+        hist += np.bincount(chunk_offsets, minlength=n_bins)
+    cdf = np.cumsum(hist)
+    n = cdf[-1]
+    
+    result = []
+    for q in percentiles:
+        # Позиция в отсортированном массиве и два соседних значения
+        rank = q / 100.0 * (n - 1)
+        lower = int(np.floor(rank))
+        upper = min(lower + 1, n - 1)
+        v_lower, v_upper = np.searchsorted(cdf, [lower, upper], side='right') + vmin
+        result.append(float(v_lower + (v_upper - v_lower) * (rank - lower)))
+    
+    return tuple(result)
+
+
 def get_mask_statistics(mask: np.ndarray, spacing: Tuple[float, float, float]) -> Dict[str, Any]:
     """
     Вычисляет статистику для маски.
@@ -239,12 +424,13 @@ def get_mask_statistics(mask: np.ndarray, spacing: Tuple[float, float, float]) -
         >>> stats = get_mask_statistics(mask, spacing)
         >>> print(f"Volume: {stats['volume_ml']:.1f} ml")
     """
-    voxel_count = int(np.sum(mask))
+    voxel_count = int(np.count_nonzero(mask))
     voxel_volume_mm3 = np.prod(spacing)
     volume_ml = voxel_count * voxel_volume_mm3 / 1000.0
     
     # Вычисляем покрытие по срезам
-    z_coverage = int(np.sum(np.sum(mask, axis=(1, 2)) > 0))
+    # (any по каждому срезу, без промежуточных сумм)
+    z_coverage = int(np.count_nonzero(mask.any(axis=(1, 2))))
     
     return {
         'voxel_count': voxel_count,
@@ -5,13 +5,38 @@
 - Обработки ошибок
 """
 
+import os
 import pydicom
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional
 from collections import defaultdict
 import numpy as np
 
 
+# Потоки для чтения файлов: GIL отпускается на файловом вводе-выводе
+# и при декодировании пикселей, поэтому потоков больше, чем ядер
+DICOM_READ_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+
+
+def _read_header(file_path: Path) -> Optional[pydicom.Dataset]:
+    """Читает заголовок DICOM-файла без пиксельных данных"""
+    try:
+        return pydicom.dcmread(str(file_path), stop_before_pixels=True)
+    except Exception as e:
+        print(f"⚠️ Ошибка чтения {file_path}: {e}")
+        return None
+
+
+def _read_dataset(file_path: Path) -> Optional[pydicom.Dataset]:
+    """Читает DICOM-файл целиком"""
+    try:
+        return pydicom.dcmread(str(file_path))
+    except Exception as e:
+        print(f"⚠️ Ошибка загрузки {file_path}: {e}")
+        return None
+
+
 class DICOMSeries:
     """Представление серии DICOM-снимков"""
     
@@ -52,21 +77,22 @@ class DICOMLoader:
         
         print(f"Найдено {len(dicom_files)} DICOM-файлов")
         
+        # Заголовки читаются параллельно, порядок файлов сохраняется
+        with ThreadPoolExecutor(max_workers=DICOM_READ_WORKERS) as executor:
+            headers = list(executor.map(_read_header, dicom_files))
+        
         # Группировка по сериям
-        for file_path in dicom_files:
-            try:
-                ds = pydicom.dcmread(str(file_path), stop_before_pixels=True)
-                series_uid = getattr(ds, 'SeriesInstanceUID', 'unknown')
-                
-                if series_uid not in self.series_dict:
-                    series_desc = getattr(ds, 'SeriesDescription', '')
-                    self.series_dict[series_uid] = DICOMSeries(series_uid, series_desc)
-                
-                self.series_dict[series_uid].files.append(file_path)
-                
-            except Exception as e:
-                print(f"⚠️ Ошибка чтения {file_path}: {e}")
+        for file_path, ds in zip(dicom_files, headers):
+            if ds is None:
                 continue
+            
+            series_uid = getattr(ds, 'SeriesInstanceUID', 'unknown')
+            
+            if series_uid not in self.series_dict:
+                series_desc = getattr(ds, 'SeriesDescription', '')
+                self.series_dict[series_uid] = DICOMSeries(series_uid, series_desc)
+            
+            self.series_dict[series_uid].files.append(file_path)
         
         return self.series_dict
     
@@ -118,15 +144,10 @@ class DICOMLoader:
         series = self.series_dict[series_uid]
         print(f"Загрузка серии: {series}")
         
-        # Загрузка всех срезов
-        slices = []
-        for file_path in series.files:
-            try:
-                ds = pydicom.dcmread(str(file_path))
-                slices.append(ds)
-            except Exception as e:
-                print(f"⚠️ Ошибка загрузки {file_path}: {e}")
-                continue
+        # Загрузка всех срезов (параллельно)
+        with ThreadPoolExecutor(max_workers=DICOM_READ_WORKERS) as executor:
+            slices = [ds for ds in executor.map(_read_dataset, series.files)
+                      if ds is not None]
         
         if not slices:
             print("⚠️ Не удалось загрузить ни одного среза")
@@ -137,7 +158,10 @@ class DICOMLoader:
         
         # Построение 3D-объема
         try:
-            self.volume_data = np.stack([s.pixel_array for s in slices])
+            # Декодирование пикселей срезов тоже параллельно
+            with ThreadPoolExecutor(max_workers=DICOM_READ_WORKERS) as executor:
+                pixel_arrays = list(executor.map(lambda s: s.pixel_array, slices))
+            self.volume_data = np.stack(pixel_arrays)
             
             # Применение Rescale Slope/Intercept для получения HU
             if hasattr(slices[0], 'RescaleSlope') and hasattr(slices[0], 'RescaleIntercept'):
@@ -8,7 +8,7 @@
 import os
 import sys
 import importlib
-import inspect
+import functools
 from pathlib import Path
 from typing import Dict, Type, List, Optional
 
@@ -48,8 +48,6 @@ def discover_models(models_dir: str = "models") -> Dict[str, Type]:
         >>> lung_model = models['Сегментация лёгких']()
         >>> mask = lung_model.segment(volume, spacing)
     """
-    models = {}
-    
     # Получаем абсолютный путь к папке models
     if not os.path.isabs(models_dir):
         # Предполагаем, что запуск из корня проекта
@@ -58,7 +56,26 @@ def discover_models(models_dir: str = "models") -> Dict[str, Type]:
     
     if not os.path.exists(models_dir):
         print(f"[WARNING] Папка моделей не найдена: {models_dir}")
-        return models
+        return {}
+    
+    # Повторное сканирование выполняется только при изменении папки
+    # (mtime меняется при добавлении/удалении файлов моделей)
+    return dict(_discover_models_cached(models_dir, os.path.getmtime(models_dir)))
+
+
+@functools.lru_cache(maxsize=4)
+def _discover_models_cached(models_dir: str, mtime: float) -> Dict[str, Type]:
+    """
+    Сканирует папку моделей и импортирует найденные классы.
+    
+    Args:
+        models_dir: Абсолютный путь к папке с моделями
+        mtime: Время изменения папки (часть ключа кеша)
+        
+    Returns:
+        Словарь {display_name: Class}
+    """
+    models = {}
     
     # Добавляем папку в PYTHONPATH для импорта
     if models_dir not in sys.path:
@@ -78,12 +95,14 @@ def discover_models(models_dir: str = "models") -> Dict[str, Type]:
             module_name = filename[:-3]  # Убираем .py
             
             try:
-                # Импортируем модуль
-                module = importlib.import_module(f"models.{module_name}")
+                # Импортируем модуль (уже загруженные берем из sys.modules)
+                module_path = f"models.{module_name}"
+                module = sys.modules.get(module_path) or importlib.import_module(module_path)
                 
                 # Ищем классы, наследующие BaseSegmenter
-                for name, obj in inspect.getmembers(module, inspect.isclass):
-                    if (issubclass(obj, BaseSegmenter) and 
+                for obj in vars(module).values():
+                    if (isinstance(obj, type) and
+                        issubclass(obj, BaseSegmenter) and 
                         obj is not BaseSegmenter and
                         hasattr(obj, 'display_name') and 
                         hasattr(obj, 'organ_key')):
@@ -216,7 +235,7 @@ class ModelRegistry:
         """
         self.models_dir = models_dir
         self._models: Dict[str, Type] = {}
-        self._instances: Dict[str, object] = {}
+        self._instances: Dict[tuple, object] = {}
     
     def load_models(self) -> None:
         """Загружает все доступные модели."""
@@ -246,7 +265,7 @@ class ModelRegistry:
             Экземпляр модели или None
         """
         # Используем кеш экземпляров
-        cache_key = f"{display_name}_{str(sorted(kwargs.items()))}"
+        cache_key = (display_name, frozenset(kwargs.items()))
         
         if cache_key not in self._instances:
             model_class = self.get_model_class(display_name)
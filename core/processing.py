@@ -5,9 +5,22 @@
 Полностью независим от GUI.
 """
 
-from typing import Dict, Any, Tuple
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple, Optional
 import numpy as np
 from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+# Минимальная толщина (в срезах) Z-слоя при параллельной разметке компонент
+MIN_LABEL_SLAB_DEPTH = 32
+
+# Начиная с этого размера куба закрытие без OpenCV выполняется сепарабельно:
+# на маске легких 200×384×384 size=3 - 0.98 с плотно против 1.27 с,
+# size=4 - 1.83 с против 1.50 с
+SEPARABLE_CLOSING_MIN_SIZE = 4
 
 
 def refine_mask(base_mask: np.ndarray,
@@ -38,8 +51,10 @@ def refine_mask(base_mask: np.ndarray,
         ...           'closing_size': 3, 'fill_holes': True}
         >>> refined, stats = refine_mask(mask, volume, spacing, params)
     """
-    mask = base_mask.copy()
-    base_count = int(np.sum(mask))
+    # Копия заранее не нужна: шаги 1-3 возвращают новые массивы, а шаг 4
+    # пишет на месте и копирует маску только если она еще входная
+    mask = base_mask
+    base_count = int(np.count_nonzero(mask))
     
     stats = {
         'base_count': base_count,
@@ -64,11 +79,14 @@ def refine_mask(base_mask: np.ndarray,
     
     # Шаг 4: Заполнение дыр
     if params.get('fill_holes', False):
+        # _fill_holes_2d пишет срезы на месте - входную маску не трогаем
+        if mask is base_mask:
+            mask = mask.copy()
         mask, step_stats = _fill_holes_2d(mask)
         stats['steps'].append({'name': 'Hole Filling', **step_stats})
     
     # Финальная статистика
-    final_count = int(np.sum(mask))
+    final_count = int(np.count_nonzero(mask))
     improvement = ((final_count - base_count) / base_count * 100) if base_count > 0 else 0
     volume_ml = final_count * np.prod(spacing) / 1000.0
     
@@ -100,18 +118,22 @@ def _apply_hu_dilation(mask: np.ndarray,
     Returns:
         Кортеж (mask, stats)
     """
-    count_before = int(np.sum(mask))
+    count_before = int(np.count_nonzero(mask))
     
-    # Создаем маску легочной ткани по HU
-    lung_tissue = ((volume >= hu_min) & (volume <= hu_max)).astype(np.uint8)
+    # Для целочисленного volume (обычно int16) границы приводятся к его типу,
+    # чтобы сравнения шли в int16, а не с повышением до float64
+    if np.issubdtype(volume.dtype, np.integer):
+        hu_min, hu_max = _integer_hu_bounds(volume.dtype, hu_min, hu_max)
     
     # Расширяем исходную маску
-    dilated = ndimage.binary_dilation(mask, iterations=iterations)
+    mask = ndimage.binary_dilation(mask, iterations=iterations)
     
-    # Пересекаем с легочной тканью
-    mask = dilated & lung_tissue
+    # Пересекаем с легочной тканью по HU прямо в буфере расширенной маски,
+    # без отдельной маски lung_tissue
+    np.logical_and(mask, volume >= hu_min, out=mask)
+    np.logical_and(mask, volume <= hu_max, out=mask)
     
-    count_after = int(np.sum(mask))
+    count_after = int(np.count_nonzero(mask))
     
     return mask, {
         'voxels_before': count_before,
@@ -120,6 +142,119 @@ def _apply_hu_dilation(mask: np.ndarray,
     }
 
 
+def binary_closing_cube(mask: np.ndarray, size: int) -> np.ndarray:
+    """
+    Эквивалент ndimage.binary_closing(mask, structure=np.ones((size,) * 3)).
+    
+    Выбирает самую быструю точную реализацию: 2D операции OpenCV на срезах,
+    без OpenCV - плотный куб SciPy для малых size и сепарабельное
+    закрытие начиная с SEPARABLE_CLOSING_MIN_SIZE.
+    
+    Args:
+        mask: Бинарная маска
+        size: Размер структурного элемента
+        
+    Returns:
+        Маска после закрытия (bool)
+    """
+    try:
+        return _binary_closing_cv2(mask, size)
+    except ImportError:
+        pass
+    
+    if size < SEPARABLE_CLOSING_MIN_SIZE:
+        return ndimage.binary_closing(mask, structure=np.ones((size,) * 3, dtype=bool))
+    return binary_closing_separable(mask, size)
+
+
+def _binary_closing_cv2(mask: np.ndarray, size: int) -> np.ndarray:
+    """
+    Морфологическое закрытие кубом size³ с 2D операциями OpenCV на срезах.
+    
+    Куб раскладывается на квадрат size×size в плоскости среза и отрезок
+    длины size по Z: расширение квадратом (cv2.dilate) -> расширение и
+    сужение по Z (ndimage) -> сужение квадратом (cv2.erode). Результат
+    совпадает с ndimage.binary_closing(mask, structure=np.ones((size,) * 3)),
+    включая привязку четных размеров и нулевую границу при сужении.
+    
+    Args:
+        mask: Бинарная 3D маска
+        size: Размер структурного элемента
+        
+    Returns:
+        Маска после закрытия (bool)
+        
+    Raises:
+        ImportError: Если OpenCV не установлен
+    """
+    import cv2
+    
+    mask = np.ascontiguousarray(mask, dtype=np.uint8)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+    z_line = np.ones((size, 1, 1), dtype=bool)
+    
+    # Привязка ядра как у SciPy (для четных size расширение и сужение
+    # смещены в разные стороны)
+    dilate_anchor = ((size - 1) // 2, (size - 1) // 2)
+    erode_anchor = (size // 2, size // 2)
+    
+    closed = np.empty_like(mask)
+    for z in range(mask.shape[0]):
+        cv2.dilate(mask[z], kernel, dst=closed[z], anchor=dilate_anchor)
+    
+    closed = ndimage.binary_dilation(closed, structure=z_line)
+    closed = ndimage.binary_erosion(closed, structure=z_line).view(np.uint8)
+    
+    for z in range(closed.shape[0]):
+        cv2.erode(closed[z], kernel, dst=closed[z], anchor=erode_anchor,
+                  borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    
+    return closed.view(bool)
+
+
+def binary_closing_separable(mask: np.ndarray, size: int) -> np.ndarray:
+    """
+    Эквивалент ndimage.binary_closing(mask, structure=np.ones((size,) * 3)).
+    
+    Кубический структурный элемент сепарабелен: замыкание кубом size³
+    эквивалентно трем 1D расширениям и трем 1D сужениям отрезками
+    длины size вдоль Z, Y и X (O(size) вместо O(size³) на воксель).
+    
+    Args:
+        mask: Бинарная маска
+        size: Размер структурного элемента
+        
+    Returns:
+        Маска после закрытия (bool)
+    """
+    lines = [np.ones(shape, dtype=bool)
+             for shape in ((size, 1, 1), (1, size, 1), (1, 1, size))]
+    for line in lines:
+        mask = ndimage.binary_dilation(mask, structure=line)
+    for line in lines:
+        mask = ndimage.binary_erosion(mask, structure=line)
+    return mask
+
+
+def _integer_hu_bounds(dtype: np.dtype, hu_min: float, hu_max: float) -> Tuple[Any, Any]:
+    """
+    Переводит HU границы в скаляры целочисленного типа volume без изменения
+    результата сравнения: v >= hu_min эквивалентно v >= ceil(hu_min),
+    v <= hu_max - v <= floor(hu_max) (с ограничением диапазоном типа).
+    """
+    info = np.iinfo(dtype)
+    low = np.ceil(hu_min)
+    high = np.floor(hu_max)
+    
+    if low > info.max or high < info.min:
+        # Диапазон вне значений типа - ни один воксель не подходит
+        return dtype.type(info.max), dtype.type(info.min)
+    
+    low = max(int(low), info.min)
+    high = min(int(high), info.max)
+    return dtype.type(low), dtype.type(high)
+
+
 def _apply_morphological_closing(mask: np.ndarray, size: int) -> Tuple[np.ndarray, Dict[str, Any]]:
     """
     Применяет морфологическое закрытие для заполнения небольших пробелов.
@@ -131,12 +266,11 @@ def _apply_morphological_closing(mask: np.ndarray, size: int) -> Tuple[np.ndarra
     Returns:
         Кортеж (mask, stats)
     """
-    count_before = int(np.sum(mask))
+    count_before = int(np.count_nonzero(mask))
     
-    structure = np.ones((size, size, size))
-    mask = ndimage.binary_closing(mask, structure=structure)
+    mask = binary_closing_cube(mask, size)
     
-    count_after = int(np.sum(mask))
+    count_after = int(np.count_nonzero(mask))
     
     return mask, {
         'voxels_before': count_before,
@@ -157,9 +291,9 @@ def _remove_small_components(mask: np.ndarray,
     Returns:
         Кортеж (mask, stats)
     """
-    count_before = int(np.sum(mask))
+    count_before = int(np.count_nonzero(mask))
     
-    labeled, num_features = ndimage.label(mask)
+    labeled, num_features = label_parallel(mask)
     
     if num_features == 0:
         return mask, {
@@ -168,19 +302,18 @@ def _remove_small_components(mask: np.ndarray,
             'components_removed': 0
         }
     
-    sizes = ndimage.sum(mask, labeled, range(1, num_features + 1))
-    max_size = np.max(sizes)
-    threshold = max_size * threshold_ratio
+    # Размеры компонент - число вхождений каждой метки (метка 0 - фон)
+    sizes = np.bincount(labeled.ravel())
+    sizes[0] = 0
+    threshold = sizes.max() * threshold_ratio
     
-    mask_cleaned = np.zeros_like(mask)
-    components_kept = 0
+    # Таблица "оставить/удалить" по метке и один проход выборки по ней
+    keep = sizes > threshold
+    keep[0] = False
+    mask_cleaned = keep[labeled]
+    components_kept = int(np.count_nonzero(keep))
     
-    for i, size in enumerate(sizes, 1):
-        if size > threshold:
-            mask_cleaned[labeled == i] = 1
-            components_kept += 1
-    
-    count_after = int(np.sum(mask_cleaned))
+    count_after = int(np.count_nonzero(mask_cleaned))
     
     return mask_cleaned, {
         'voxels_before': count_before,
@@ -192,32 +325,106 @@ def _remove_small_components(mask: np.ndarray,
     }
 
 
+def label_parallel(mask: np.ndarray,
+                    max_workers: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    Разметка связных компонент (6-связность) с разбиением volume на Z-слои.
+    
+    Каждый слой размечается ndimage.label в отдельном потоке (SciPy
+    отпускает GIL), затем метки компонент, соприкасающихся через границы
+    слоев, объединяются поиском компонент связности графа эквивалентностей.
+    Для тонких volume используется обычный ndimage.label.
+    
+    Args:
+        mask: Бинарная 3D маска
+        max_workers: Максимальное число потоков (по умолчанию - число CPU)
+        
+    Returns:
+        Кортеж (labeled, num_features), как у ndimage.label
+        (нумерация компонент может отличаться)
+    """
+    n_slices = mask.shape[0]
+    n_slabs = min(max_workers or os.cpu_count() or 1, n_slices // MIN_LABEL_SLAB_DEPTH)
+    
+    if n_slabs < 2:
+        return ndimage.label(mask)
+    
+    bounds = np.linspace(0, n_slices, n_slabs + 1).astype(int)
+    labeled = np.empty(mask.shape, dtype=np.int32)
+    
+    # Каждый слой размечается прямо в свой участок общего массива меток
+    def label_slab(z0: int, z1: int) -> int:
+        return ndimage.label(mask[z0:z1], output=labeled[z0:z1])
+    
+    with ThreadPoolExecutor(max_workers=n_slabs) as executor:
+        slab_features = list(executor.map(label_slab, bounds[:-1], bounds[1:]))
+    
+    # Глобально уникальные метки: сдвиг меток слоя на месте
+    offset = 0
+    for z0, z1, n_features in zip(bounds[:-1], bounds[1:], slab_features):
+        if offset:
+            slab = labeled[z0:z1]
+            np.add(slab, offset, out=slab, where=slab > 0)
+        offset += n_features
+    
+    # Ребра графа: пары меток, соседствующих по Z на границах слоев
+    rows, cols = [], []
+    for z in bounds[1:-1]:
+        below, above = labeled[z - 1], labeled[z]
+        touching = (below > 0) & (above > 0)
+        rows.append(below[touching])
+        cols.append(above[touching])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    
+    graph = coo_matrix((np.ones(rows.size, dtype=np.int8), (rows, cols)),
+                       shape=(offset + 1, offset + 1))
+    num_features, components = connected_components(graph, directed=False)
+    num_features -= 1  # Фон (метка 0) - отдельная вершина без ребер
+    
+    # Фон должен остаться меткой 0
+    background = components[0]
+    if background != 0:
+        components[components == 0] = background
+        components[0] = 0
+    
+    # Перенумерация по слоям на месте: временный буфер - один слой
+    lookup = components.astype(np.int32, copy=False)
+    for z0, z1 in zip(bounds[:-1], bounds[1:]):
+        labeled[z0:z1] = lookup[labeled[z0:z1]]
+    return labeled, num_features
+
+
 def _fill_holes_2d(mask: np.ndarray) -> Tuple[np.ndarray, Dict[str, Any]]:
     """
     Заполняет дыры в маске (2D операция на каждом срезе).
     
+    Пустые срезы отбрасываются одним векторным проходом, непустые
+    заполняются параллельно (ndimage отпускает GIL) и записываются
+    в маску на месте.
+    
     Args:
         mask: Исходная маска
         
     Returns:
         Кортеж (mask, stats)
     """
-    count_before = int(np.sum(mask))
-    total_slices = mask.shape[0]
-    slices_processed = 0
+    count_before = int(np.count_nonzero(mask))
+    nonempty_z = np.flatnonzero(mask.reshape(mask.shape[0], -1).any(axis=1))
     
-    for z in range(total_slices):
-        if np.any(mask[z]):
-            mask[z] = ndimage.binary_fill_holes(mask[z])
-            slices_processed += 1
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        filled_slices = executor.map(ndimage.binary_fill_holes,
+                                     (mask[z] for z in nonempty_z))
+        for z, filled in zip(nonempty_z, filled_slices):
+            mask[z] = filled
     
-    count_after = int(np.sum(mask))
+    count_after = int(np.count_nonzero(mask))
     
     return mask, {
         'voxels_before': count_before,
         'voxels_after': count_after,
         'voxels_added': count_after - count_before,
-        'slices_processed': slices_processed
+        'slices_processed': int(nonempty_z.size)
     }
 
 
@@ -236,21 +443,20 @@ def calculate_mask_difference(mask1: np.ndarray, mask2: np.ndarray) -> Dict[str,
         >>> diff = calculate_mask_difference(original_mask, refined_mask)
         >>> print(f"Added voxels: {diff['added_voxels']}")
     """
-    mask1_bool = mask1.astype(bool)
-    mask2_bool = mask2.astype(bool)
-    
-    # Вычисляем различия
-    added = mask2_bool & ~mask1_bool
-    removed = mask1_bool & ~mask2_bool
-    unchanged = mask1_bool & mask2_bool
+    # Все счетчики выводятся из трех подсчетов: |A|, |B| и |A ∩ B|.
+    # Это избавляет от промежуточных масок added/removed/unchanged
+    # и повторных проходов по volume.
+    count1 = int(np.count_nonzero(mask1))
+    count2 = int(np.count_nonzero(mask2))
+    intersection = int(np.count_nonzero(np.logical_and(mask1, mask2)))
     
     return {
-        'mask1_count': int(np.sum(mask1_bool)),
-        'mask2_count': int(np.sum(mask2_bool)),
-        'added_voxels': int(np.sum(added)),
-        'removed_voxels': int(np.sum(removed)),
-        'unchanged_voxels': int(np.sum(unchanged)),
-        'dice_coefficient': calculate_dice_coefficient(mask1_bool, mask2_bool)
+        'mask1_count': count1,
+        'mask2_count': count2,
+        'added_voxels': count2 - intersection,
+        'removed_voxels': count1 - intersection,
+        'unchanged_voxels': intersection,
+        'dice_coefficient': _dice_from_counts(intersection, count1, count2)
     }
 
 
@@ -265,12 +471,26 @@ def calculate_dice_coefficient(mask1: np.ndarray, mask2: np.ndarray) -> float:
     Returns:
         Dice коэффициент (0.0 - 1.0)
         
+    Raises:
+        ValueError: Если размеры масок не совпадают
+        
     Example:
         >>> dice = calculate_dice_coefficient(mask1, mask2)
         >>> print(f"Dice: {dice:.3f}")
     """
-    intersection = np.sum(mask1 & mask2)
-    sum_masks = np.sum(mask1) + np.sum(mask2)
+    if mask1 is mask2:
+        return 1.0  # Один и тот же буфер - совпадение без подсчета
+    
+    if mask1.shape != mask2.shape:
+        raise ValueError(f"Размеры масок не совпадают: {mask1.shape} и {mask2.shape}")
+    
+    intersection = np.count_nonzero(np.logical_and(mask1, mask2))
+    return _dice_from_counts(intersection, np.count_nonzero(mask1), np.count_nonzero(mask2))
+
+
+def _dice_from_counts(intersection: int, count1: int, count2: int) -> float:
+    """Dice по уже подсчитанным количествам вокселей."""
+    sum_masks = count1 + count2
     
     if sum_masks == 0:
         return 1.0  # Обе маски пустые - считаем идеальным совпадением
@@ -5,21 +5,83 @@
 некорректных действий пользователя (например, нажатие "Сегментировать" во время загрузки).
 """
 
-from typing import Dict, Any, Optional
-from enum import Enum
+import functools
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Callable
+from enum import IntFlag
 
+try:
+    from PyQt5.QtCore import QCoreApplication, QObject, QThread, Qt, pyqtSignal
+except ImportError:
+    # Без Qt (скрипты, отладка) изменения виджетов применяются сразу
+    QCoreApplication = None
+    QObject = None
+else:
+    class _FlushDispatcher(QObject):
+        """Доставляет запрос на обновление виджетов в GUI поток (очередью)."""
+        requested = pyqtSignal()
 
-class UIState(Enum):
-    """Возможные состояния приложения."""
-    INITIAL = "initial"
-    VOLUME_LOADED = "volume_loaded"
-    ROI1_DEFINED = "roi1_defined"  # ROI 1 определены
-    ROI2_DEFINED = "roi2_defined"  # ROI 2 определены
-    ROI_DEFINED = "roi_defined"
-    SEGMENTING = "segmenting"
-    MASK_READY = "mask_ready"
-    REFINING = "refining"
-    SAVING = "saving"
+logger = logging.getLogger(__name__)
+
+
+class UIState(IntFlag):
+    """
+    Возможные состояния приложения.
+    
+    Каждое состояние - отдельный бит, поэтому принадлежность к группе
+    состояний проверяется одной операцией & с маской.
+    """
+    INITIAL = 1
+    VOLUME_LOADED = 2
+    ROI1_DEFINED = 4  # ROI 1 определены
+    ROI2_DEFINED = 8  # ROI 2 определены
+    ROI_DEFINED = 16
+    SEGMENTING = 32
+    MASK_READY = 64
+    REFINING = 128
+    SAVING = 256
+
+
+# Параметры постобработки (включаются и выключаются вместе). Если
+# зарегистрирован контейнер 'grp_refinement' (QGroupBox с этими виджетами),
+# переключается только он - Qt сам передает enabled дочерним виджетам
+_REFINEMENT_GROUP = 'grp_refinement'
+_REFINEMENT_PARAM_WIDGETS = (
+    'slider_hu_min', 'slider_hu_max',
+    'slider_dilation', 'slider_closing',
+    'cb_fill_holes',
+    'btn_conservative_preset', 'btn_aggressive_preset'
+)
+
+# Канонический порядок виджетов в масках состояний
+_WIDGET_ORDER = (
+    'btn_load', 'btn_draw_roi1', 'btn_draw_roi2', 'btn_reset_roi',
+    'btn_segment', 'btn_apply_refinement', 'btn_reset_mask', 'btn_save',
+    'slice_slider', _REFINEMENT_GROUP,
+)
+
+# Доступность виджетов по состояниям в порядке _WIDGET_ORDER.
+# None - виджет не изменяется; ROI2_DEFINED не меняет ничего
+_STATE_MASKS: Dict[UIState, Tuple[Optional[bool], ...]] = {
+    #                       load   roi1   roi2   reset  segm   refine rst_m  save   slider params
+    # Начальное состояние - доступна только загрузка
+    UIState.INITIAL:       (True,  False, False, False, False, False, False, False, False, False),
+    # Volume загружен - доступны ROI и навигация
+    UIState.VOLUME_LOADED: (True,  True,  False, True,  False, False, False, False, True,  False),
+    # ROI 1 определен - доступно рисование ROI 2
+    UIState.ROI1_DEFINED:  (True,  True,  True,  True,  False, False, False, False, True,  False),
+    # ROI определены - доступна сегментация
+    UIState.ROI_DEFINED:   (True,  True,  True,  True,  True,  False, False, False, True,  False),
+    # Идет сегментация - заблокировано все, кроме просмотра срезов
+    UIState.SEGMENTING:    (False, False, False, False, False, False, False, False, True,  False),
+    # Маска готова - доступны постобработка и сохранение
+    UIState.MASK_READY:    (True,  True,  True,  True,  True,  True,  True,  True,  True,  True),
+    # Идет постобработка - заблокированы действия с маской
+    UIState.REFINING:      (False, False, False, False, False, False, False, False, True,  False),
+    # Идет сохранение - блокируются только загрузка, постобработка и сохранение
+    UIState.SAVING:        (False, None,  None,  None,  None,  False, None,  False, None,  None),
+}
 
 
 class UIStateManager:
@@ -29,11 +91,34 @@ class UIStateManager:
     Управляет доступностью виджетов в зависимости от текущего состояния приложения.
     """
     
+    __slots__ = (
+        '_current_state', '_setters', '_state_callbacks',
+        '_state_plan', '_last_applied', '_flush_scheduled', '_lock',
+        '_dispatcher', '_notified_state', '__weakref__'  # weakref нужен Qt для связи с _flush
+    )
+    
+    # Группы состояний для проверок can_*
+    _BUSY_MASK = UIState.SEGMENTING | UIState.REFINING | UIState.SAVING
+    _SEGMENT_MASK = UIState.ROI_DEFINED | UIState.MASK_READY
+    
     def __init__(self) -> None:
         """Инициализирует менеджер состояний."""
         self._current_state: UIState = UIState.INITIAL
-        self._widgets: Dict[str, Any] = {}
+        self._setters: Dict[str, Callable[[bool], None]] = {}
         self._state_callbacks: Dict[UIState, callable] = {}
+        self._state_plan: Dict[UIState, List[Tuple[str, Callable[[bool], None], bool]]] = {}
+        self._last_applied: Dict[str, bool] = {}
+        self._flush_scheduled: bool = False
+        self._notified_state: UIState = UIState.INITIAL
+        
+        # Переходы вызываются и из GUI потока, и из обработчиков worker'ов:
+        # смена состояния защищена блокировкой, а виджеты меняются только
+        # в потоке, где создан менеджер (через queued-сигнал)
+        self._lock = threading.Lock()
+        self._dispatcher = None
+        if QObject is not None:
+            self._dispatcher = _FlushDispatcher()
+            self._dispatcher.requested.connect(self._flush, Qt.QueuedConnection)
     
     def register_widgets(self, widgets: Dict[str, Any]) -> None:
         """
@@ -49,16 +134,57 @@ class UIStateManager:
             ...     'slider_hu_min': self.slider_hu_min
             ... })
         """
-        self._widgets = widgets
+        # Связанные методы setEnabled берутся один раз при регистрации
+        self._setters = {
+            name: widget.setEnabled
+            for name, widget in widgets.items()
+            if hasattr(widget, 'setEnabled')
+        }
+        
+        # Разрешаем имена виджетов один раз: переход между состояниями
+        # становится циклом по готовым тройкам (имя, setEnabled, enabled)
+        self._state_plan = {}
+        self._last_applied = {}
+        
+        # Параметры постобработки - одним контейнером, если он есть
+        if _REFINEMENT_GROUP in self._setters:
+            param_widgets = (_REFINEMENT_GROUP,)
+        else:
+            param_widgets = _REFINEMENT_PARAM_WIDGETS
+        
+        for state, mask in _STATE_MASKS.items():
+            plan = []
+            for widget_name, enabled in zip(_WIDGET_ORDER, mask):
+                if enabled is None:
+                    continue
+                names = param_widgets if widget_name == _REFINEMENT_GROUP else (widget_name,)
+                for name in names:
+                    setter = self._setters.get(name)
+                    if setter is not None:
+                        plan.append((name, setter, enabled))
+            self._state_plan[state] = plan
     
-    def register_state_callback(self, state: UIState, callback: callable) -> None:
+    def register_state_callback(self, state: UIState, callback: callable,
+                                *args: Any, **kwargs: Any) -> None:
         """
         Регистрирует callback для вызова при переходе в состояние.
         
+        Аргументы связываются с callback один раз при регистрации
+        (functools.partial), поэтому при переходе выполняется один вызов
+        без аргументов - без lambda-оберток на стороне вызывающего кода.
+        
         Args:
             state: Состояние для отслеживания
             callback: Функция для вызова
+            *args: Позиционные аргументы для callback
+            **kwargs: Именованные аргументы для callback
+            
+        Example:
+            >>> manager.register_state_callback(
+            ...     UIState.SEGMENTING, self.update_progress_bar, channel='seg')
         """
+        if args or kwargs:
+            callback = functools.partial(callback, *args, **kwargs)
         self._state_callbacks[state] = callback
     
     @property
@@ -70,173 +196,123 @@ class UIStateManager:
         """
         Переводит UI в новое состояние.
         
+        Состояние меняется сразу, а виджеты обновляются отложенно - один раз
+        за итерацию цикла событий Qt для последнего состояния. Серия быстрых
+        переходов (например, из сигналов worker'а) дает одно обновление.
+        
+        Callback вызывается только для итогового состояния серии:
+        промежуточные состояния, которые так и не были показаны, callback
+        не получают. Если он нужен на каждый переход - transition_to_sync.
+        
         Args:
             new_state: Целевое состояние
             
         Example:
             >>> manager.transition_to(UIState.VOLUME_LOADED)
         """
-        if new_state == self._current_state:
+        # Частый случай (повторный переход в то же состояние) - одно
+        # сравнение идентичности без логирования и обращений к словарям
+        current_state = self._current_state
+        if new_state is current_state or new_state == current_state:
+            return
+        
+        with self._lock:
+            current_state = self._current_state
+            if new_state == current_state:
+                return
+            self._current_state = new_state
+        
+        logger.debug("%s -> %s", current_state.name, new_state.name)
+        self._schedule_flush()
+    
+    def transition_to_sync(self, new_state: UIState) -> None:
+        """
+        Переводит UI в новое состояние с немедленным обновлением виджетов.
+        
+        Немедленно - только из GUI потока. Из другого потока обновление
+        виджетов и callback выполняются через очередь событий в GUI потоке.
+        
+        Args:
+            new_state: Целевое состояние
+        """
+        with self._lock:
+            current_state = self._current_state
+            if new_state == current_state:
+                return
+            self._current_state = new_state
+        
+        logger.debug("%s -> %s", current_state.name, new_state.name)
+        
+        # Вне GUI потока виджеты трогать нельзя - обновление и callback
+        # уходят в очередь и выполняются в _flush в GUI потоке
+        if not self._on_gui_thread():
+            self._schedule_flush()
             return
         
-        print(f"[StateManager] {self._current_state.value} -> {new_state.value}")
-        self._current_state = new_state
         self._apply_state()
         
         # Вызов callback если зарегистрирован
-        if new_state in self._state_callbacks:
-            self._state_callbacks[new_state]()
+        self._notified_state = new_state
+        callback = self._state_callbacks.get(new_state)
+        if callback is not None:
+            callback()
+    
+    def _schedule_flush(self) -> None:
+        """Планирует применение состояния на следующую итерацию цикла событий."""
+        # Нет Qt или QApplication еще не создан - применяем сразу
+        if self._dispatcher is None or QCoreApplication.instance() is None:
+            self._flush()
+            return
+        
+        with self._lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        
+        self._dispatcher.requested.emit()
+    
+    def _flush(self) -> None:
+        """Применяет к виджетам последнее установленное состояние."""
+        with self._lock:
+            self._flush_scheduled = False
+            state = self._current_state
+            notify = state != self._notified_state
+            self._notified_state = state
+        
+        self._apply_state()
+        
+        # Callback только для итогового состояния, пропущенные не уведомляются
+        if notify:
+            callback = self._state_callbacks.get(state)
+            if callback is not None:
+                callback()
+    
+    def _on_gui_thread(self) -> bool:
+        """Проверяет, что вызов идет из потока, владеющего виджетами."""
+        if self._dispatcher is None:
+            return True
+        return QThread.currentThread() == self._dispatcher.thread()
     
     def _apply_state(self) -> None:
-        """Применяет конфигурацию виджетов для текущего состояния."""
-        state = self._current_state
-        
-        if state == UIState.INITIAL:
-            self._set_initial_state()
-        elif state == UIState.ROI1_DEFINED:  # ДОБАВЬТЕ ЭТИ ДВЕ СТРОКИ
-            self._set_roi1_defined_state()
-        elif state == UIState.VOLUME_LOADED:
-            self._set_volume_loaded_state()
-        elif state == UIState.ROI_DEFINED:
-            self._set_roi_defined_state()
-        elif state == UIState.SEGMENTING:
-            self._set_segmenting_state()
-        elif state == UIState.MASK_READY:
-            self._set_mask_ready_state()
-        elif state == UIState.REFINING:
-            self._set_refining_state()
-        elif state == UIState.SAVING:
-            self._set_saving_state()
-    
-    def _set_widget_enabled(self, widget_name: str, enabled: bool) -> None:
-        """Устанавливает enabled состояние виджета."""
-        if widget_name in self._widgets:
-            widget = self._widgets[widget_name]
-            if hasattr(widget, 'setEnabled'):
-                widget.setEnabled(enabled)
-    
-    def _set_initial_state(self) -> None:
-        """Начальное состояние - доступна только загрузка."""
-        self._set_widget_enabled('btn_load', True)
-        self._set_widget_enabled('btn_draw_roi1', False)
-        self._set_widget_enabled('btn_draw_roi2', False)
-        self._set_widget_enabled('btn_reset_roi', False)
-        self._set_widget_enabled('btn_segment', False)
-        self._set_widget_enabled('btn_apply_refinement', False)
-        self._set_widget_enabled('btn_reset_mask', False)
-        self._set_widget_enabled('btn_save', False)
-        self._set_widget_enabled('slice_slider', False)
-        
-        # Параметры постобработки
-        self._set_refinement_params_enabled(False)
-    
-    def _set_volume_loaded_state(self) -> None:
-        """Volume загружен - доступны ROI и навигация."""
-        self._set_widget_enabled('btn_load', True)
-        self._set_widget_enabled('btn_draw_roi1', True)
-        self._set_widget_enabled('btn_draw_roi2', False)
-        self._set_widget_enabled('btn_reset_roi', True)
-        self._set_widget_enabled('btn_segment', False)
-        self._set_widget_enabled('btn_apply_refinement', False)
-        self._set_widget_enabled('btn_reset_mask', False)
-        self._set_widget_enabled('btn_save', False)
-        self._set_widget_enabled('slice_slider', True)
-        
-        self._set_refinement_params_enabled(False)
-    def _set_roi1_defined_state(self) -> None:
-        """ROI 1 определен - доступно рисование ROI 2."""
-        self._set_widget_enabled('btn_load', True)
-        self._set_widget_enabled('btn_draw_roi1', True)
-        self._set_widget_enabled('btn_draw_roi2', True)  # ВОТ ОНО!
-        self._set_widget_enabled('btn_reset_roi', True)
-        self._set_widget_enabled('btn_segment', False)
-        self._set_widget_enabled('btn_apply_refinement', False)
-        self._set_widget_enabled('btn_reset_mask', False)
-        self._set_widget_enabled('btn_save', False)
-        self._set_widget_enabled('slice_slider', True)
-    
-        self._set_refinement_params_enabled(False)
-   
-    def _set_roi_defined_state(self) -> None:
-        """ROI определены - доступна сегментация."""
-        self._set_widget_enabled('btn_load', True)
-        self._set_widget_enabled('btn_draw_roi1', True)
-        self._set_widget_enabled('btn_draw_roi2', True)
-        self._set_widget_enabled('btn_reset_roi', True)
-        self._set_widget_enabled('btn_segment', True)
-        self._set_widget_enabled('btn_apply_refinement', False)
-        self._set_widget_enabled('btn_reset_mask', False)
-        self._set_widget_enabled('btn_save', False)
-        self._set_widget_enabled('slice_slider', True)
-        
-        self._set_refinement_params_enabled(False)
-    
-    def _set_segmenting_state(self) -> None:
-        """Идет сегментация - заблокированы все действия."""
-        self._set_widget_enabled('btn_load', False)
-        self._set_widget_enabled('btn_draw_roi1', False)
-        self._set_widget_enabled('btn_draw_roi2', False)
-        self._set_widget_enabled('btn_reset_roi', False)
-        self._set_widget_enabled('btn_segment', False)
-        self._set_widget_enabled('btn_apply_refinement', False)
-        self._set_widget_enabled('btn_reset_mask', False)
-        self._set_widget_enabled('btn_save', False)
-        self._set_widget_enabled('slice_slider', True)  # Можно смотреть срезы
-        
-        self._set_refinement_params_enabled(False)
-    
-    def _set_mask_ready_state(self) -> None:
-        """Маска готова - доступны постобработка и сохранение."""
-        self._set_widget_enabled('btn_load', True)
-        self._set_widget_enabled('btn_draw_roi1', True)
-        self._set_widget_enabled('btn_draw_roi2', True)
-        self._set_widget_enabled('btn_reset_roi', True)
-        self._set_widget_enabled('btn_segment', True)
-        self._set_widget_enabled('btn_apply_refinement', True)
-        self._set_widget_enabled('btn_reset_mask', True)
-        self._set_widget_enabled('btn_save', True)
-        self._set_widget_enabled('slice_slider', True)
-        
-        self._set_refinement_params_enabled(True)
-    
-    def _set_refining_state(self) -> None:
-        """Идет постобработка - заблокированы действия с маской."""
-        self._set_widget_enabled('btn_load', False)
-        self._set_widget_enabled('btn_draw_roi1', False)
-        self._set_widget_enabled('btn_draw_roi2', False)
-        self._set_widget_enabled('btn_reset_roi', False)
-        self._set_widget_enabled('btn_segment', False)
-        self._set_widget_enabled('btn_apply_refinement', False)
-        self._set_widget_enabled('btn_reset_mask', False)
-        self._set_widget_enabled('btn_save', False)
-        self._set_widget_enabled('slice_slider', True)
-        
-        self._set_refinement_params_enabled(False)
-    
-    def _set_saving_state(self) -> None:
-        """Идет сохранение."""
-        self._set_widget_enabled('btn_load', False)
-        self._set_widget_enabled('btn_save', False)
-        self._set_widget_enabled('btn_apply_refinement', False)
-    
-    def _set_refinement_params_enabled(self, enabled: bool) -> None:
-        """Устанавливает доступность параметров постобработки."""
-        param_widgets = [
-            'slider_hu_min', 'slider_hu_max',
-            'slider_dilation', 'slider_closing',
-            'cb_fill_holes',
-            'btn_conservative_preset', 'btn_aggressive_preset'
-        ]
-        for widget_name in param_widgets:
-            self._set_widget_enabled(widget_name, enabled)
+        """
+        Применяет конфигурацию виджетов для текущего состояния.
+        
+        setEnabled вызывается только для виджетов, чье значение отличается
+        от примененного ранее (каждый вызов в Qt - перерисовка и сигналы).
+        """
+        last_applied = self._last_applied
+        for widget_name, set_enabled, enabled in self._state_plan.get(self._current_state, ()):
+            if last_applied.get(widget_name) != enabled:
+                set_enabled(enabled)
+                last_applied[widget_name] = enabled
     
     def can_load_dicom(self) -> bool:
         """Проверяет, можно ли загрузить DICOM."""
-        return self._current_state not in [UIState.SEGMENTING, UIState.REFINING, UIState.SAVING]
+        return not (self._current_state & self._BUSY_MASK)
     
     def can_segment(self) -> bool:
         """Проверяет, можно ли запустить сегментацию."""
-        return self._current_state in [UIState.ROI_DEFINED, UIState.MASK_READY]
+        return bool(self._current_state & self._SEGMENT_MASK)
     
     def can_refine(self) -> bool:
         """Проверяет, можно ли запустить постобработку."""
@@ -244,4 +320,5 @@ class UIStateManager:
     
     def can_save(self) -> bool:
         """Проверяет, можно ли сохранить маску."""
-        return self._current_state == UIState.MASK_READY
\ No newline at end of file
+        return self._current_state == UIState.MASK_READY
+
@@ -130,22 +130,23 @@ class ConfigEditorDialog(QDialog):
     def _setup_ui(self):
         layout = QVBoxLayout(self)
         
-        # Вкладки
-        tabs = QTabWidget()
+        # Вкладки: содержимое строится при первом открытии вкладки,
+        # до этого в QTabWidget лежат пустые контейнеры
+        self.tabs = QTabWidget()
+        self._tab_factories = [
+            self._create_processing_modes_tab,  # Вкладка 1: Режимы обработки
+            self._create_modules_tab,           # Вкладка 2: Видимость модулей
+            self._create_layout_tab,            # Вкладка 3: Компоновка интерфейса
+        ]
+        self._built_tabs = set()
         
-        # Вкладка 1: Режимы обработки
-        processing_tab = self._create_processing_modes_tab()
-        tabs.addTab(processing_tab, "Режимы обработки")
+        for title in ("Режимы обработки", "Модули", "Компоновка"):
+            self.tabs.addTab(QWidget(), title)
         
-        # Вкладка 2: Видимость модулей
-        modules_tab = self._create_modules_tab()
-        tabs.addTab(modules_tab, "Модули")
+        self.tabs.currentChanged.connect(self._materialize_tab)
+        self._materialize_tab(self.tabs.currentIndex())
         
-        # Вкладка 3: Компоновка интерфейса
-        layout_tab = self._create_layout_tab()
-        tabs.addTab(layout_tab, "Компоновка")
-        
-        layout.addWidget(tabs)
+        layout.addWidget(self.tabs)
         
         # Кнопки
         buttons_layout = QHBoxLayout()
@@ -160,6 +161,23 @@ class ConfigEditorDialog(QDialog):
         
         layout.addLayout(buttons_layout)
     
+    def reload(self):
+        """Перечитывает конфигурацию в уже построенные вкладки"""
+        if 0 in self._built_tabs:
+            self._load_processing_modes()
+        if 1 in self._built_tabs:
+            self._load_modules()
+    
+    def _materialize_tab(self, index: int):
+        """Строит содержимое вкладки при первом ее открытии"""
+        if index < 0 or index in self._built_tabs:
+            return
+        self._built_tabs.add(index)
+        
+        container_layout = QVBoxLayout(self.tabs.widget(index))
+        container_layout.setContentsMargins(0, 0, 0, 0)
+        container_layout.addWidget(self._tab_factories[index]())
+    
     def _create_processing_modes_tab(self):
         """Вкладка управления режимами обработки"""
         widget = QWidget()
@@ -198,12 +216,22 @@ class ConfigEditorDialog(QDialog):
     def _load_processing_modes(self):
         """Загружает режимы обработки в таблицу"""
         modes = self.config_manager.get_processing_modes()
-        self.modes_table.setRowCount(len(modes))
+        table = self.modes_table
         
-        for i, mode in enumerate(modes):
-            self.modes_table.setItem(i, 0, QTableWidgetItem(mode['id']))
-            self.modes_table.setItem(i, 1, QTableWidgetItem(mode['name']))
-            self.modes_table.setItem(i, 2, QTableWidgetItem(str(mode['parameters'])))
+        # Заполняем таблицу без промежуточных перерисовок и сигналов
+        table.setUpdatesEnabled(False)
+        table.blockSignals(True)
+        try:
+            table.setRowCount(len(modes))
+            
+            for i, mode in enumerate(modes):
+                table.setItem(i, 0, QTableWidgetItem(mode['id']))
+                table.setItem(i, 1, QTableWidgetItem(mode['name']))
+                table.setItem(i, 2, QTableWidgetItem(str(mode['parameters'])))
+        finally:
+            table.blockSignals(False)
+            table.setUpdatesEnabled(True)
+        table.viewport().update()
     
     def _create_modules_tab(self):
         """Вкладка управления модулями"""
@@ -226,16 +254,25 @@ class ConfigEditorDialog(QDialog):
     def _load_modules(self):
         """Загружает модули в таблицу"""
         modules = self.config_manager.get_modules()
-        self.modules_table.setRowCount(len(modules))
+        table = self.modules_table
         
-        for i, (module_id, config) in enumerate(modules.items()):
-            self.modules_table.setItem(i, 0, QTableWidgetItem(module_id))
-            self.modules_table.setItem(i, 1, QTableWidgetItem(config['name']))
-            
-            visible_item = QTableWidgetItem("Да" if config['visible'] else "Нет")
-            self.modules_table.setItem(i, 2, visible_item)
+        # Заполняем таблицу без промежуточных перерисовок и сигналов
+        table.setUpdatesEnabled(False)
+        table.blockSignals(True)
+        try:
+            table.setRowCount(len(modules))
             
-            self.modules_table.setItem(i, 3, QTableWidgetItem(str(config['order'])))
+            for i, (module_id, config) in enumerate(modules.items()):
+                name, visible, order = config['name'], config['visible'], config['order']
+                
+                table.setItem(i, 0, QTableWidgetItem(module_id))
+                table.setItem(i, 1, QTableWidgetItem(name))
+                table.setItem(i, 2, QTableWidgetItem("Да" if visible else "Нет"))
+                table.setItem(i, 3, QTableWidgetItem(str(order)))
+        finally:
+            table.blockSignals(False)
+            table.setUpdatesEnabled(True)
+        table.viewport().update()
     
     def _create_layout_tab(self):
         """Вкладка управления компоновкой"""
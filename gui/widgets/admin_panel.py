@@ -13,6 +13,7 @@ class AdminPanel(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.config_manager = None
+        self._config_dialog = None  # Редактор создается один раз и переиспользуется
         self._setup_ui()
     
     def _setup_ui(self):
@@ -43,6 +44,8 @@ class AdminPanel(QWidget):
     
     def set_config_manager(self, config_manager):
         """Устанавливает менеджер конфигурации"""
+        if config_manager is not self.config_manager:
+            self._config_dialog = None
         self.config_manager = config_manager
     
     def _on_config_clicked(self):
@@ -50,8 +53,13 @@ class AdminPanel(QWidget):
         from gui.dialogs.config_editor import ConfigEditorDialog
         
         if self.config_manager:
-            dialog = ConfigEditorDialog(self.config_manager, self)
-            dialog.exec_()
+            if self._config_dialog is None:
+                self._config_dialog = ConfigEditorDialog(self.config_manager, self)
+            elif self.config_manager.dirty:
+                # Конфигурация менялась - обновляем только данные таблиц
+                self._config_dialog.reload()
+            self.config_manager.dirty = False
+            self._config_dialog.exec_()
         else:
             QMessageBox.warning(self, "Ошибка", "ConfigManager не установлен")
     
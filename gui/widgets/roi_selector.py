@@ -4,7 +4,9 @@
 Позволяет пользователю рисовать прямоугольные области на изображении.
 """
 
-from typing import Tuple, Optional, Callable
+from typing import Tuple, Optional, Callable, Sequence
+
+import numpy as np
 from matplotlib.patches import Rectangle
 
 
@@ -32,6 +34,9 @@ class ROISelector:
         self.y0: Optional[float] = None
         self.press: Optional[Tuple[float, float]] = None
         
+        # Фон осей без прямоугольника для blit-перерисовки при перетаскивании
+        self._background = None
+        
         # Connection IDs для отключения
         self.cidpress: Optional[int] = None
         self.cidrelease: Optional[int] = None
@@ -67,10 +72,31 @@ class ROISelector:
         self.press = (event.xdata, event.ydata)
         self.x0, self.y0 = event.xdata, event.ydata
         
-        # Удаляем предыдущий прямоугольник если есть
-        if self.rect is not None:
-            self.rect.remove()
-            self.rect = None
+        # Один прямоугольник на весь выбор: создаем при первом нажатии,
+        # дальше только меняем его геометрию и стиль
+        if self.rect is None:
+            self.rect = Rectangle(
+                (self.x0, self.y0), 0, 0,
+                linewidth=2, edgecolor='red', facecolor='none',
+                linestyle='--', alpha=0.8
+            )
+            self.ax.add_patch(self.rect)
+        else:
+            self.rect.set_bounds(self.x0, self.y0, 0, 0)
+            self.rect.set_linestyle('--')
+            self.rect.set_linewidth(2)
+            self.rect.set_alpha(0.8)
+        
+        # Прямоугольник показывается с первым движением мыши
+        self.rect.set_visible(False)
+        
+        # Запоминаем фон один раз: при движении перерисовывается только
+        # прямоугольник поверх сохраненного фона, а не вся фигура
+        canvas = self.ax.figure.canvas
+        if getattr(canvas, 'supports_blit', False):
+            self.rect.set_animated(True)
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self.ax.bbox)
     
     def on_motion(self, event) -> None:
         """
@@ -87,20 +113,17 @@ class ROISelector:
         
         x1, y1 = event.xdata, event.ydata
         
-        # Удаляем предыдущий прямоугольник
-        if self.rect is not None:
-            self.rect.remove()
+        # Обновляем геометрию существующего прямоугольника
+        self.rect.set_bounds(self.x0, self.y0, x1 - self.x0, y1 - self.y0)
+        self.rect.set_visible(True)
         
-        # Рисуем новый прямоугольник
-        width = x1 - self.x0
-        height = y1 - self.y0
-        self.rect = Rectangle(
-            (self.x0, self.y0), width, height,
-            linewidth=2, edgecolor='red', facecolor='none',
-            linestyle='--', alpha=0.8
-        )
-        self.ax.add_patch(self.rect)
-        self.ax.figure.canvas.draw_idle()
+        canvas = self.ax.figure.canvas
+        if self._background is not None:
+            canvas.restore_region(self._background)
+            self.ax.draw_artist(self.rect)
+            canvas.blit(self.ax.bbox)
+        else:
+            canvas.draw_idle()
     
     def on_release(self, event) -> None:
         """
@@ -112,8 +135,12 @@ class ROISelector:
         if self.press is None:
             return
         
+        # Перетаскивание закончено - прямоугольник снова рисуется с фигурой
+        self._stop_blit()
+        
         if event.xdata is None or event.ydata is None:
             self.press = None
+            self.ax.figure.canvas.draw_idle()
             return
         
         x1, y1 = event.xdata, event.ydata
@@ -147,8 +174,15 @@ class ROISelector:
         # Отключаем селектор
         self.disconnect()
     
+    def _stop_blit(self) -> None:
+        """Возвращает прямоугольник в обычную отрисовку и сбрасывает фон."""
+        self._background = None
+        if self.rect is not None:
+            self.rect.set_animated(False)
+    
     def cancel(self) -> None:
         """Отменяет текущий выбор ROI."""
+        self._stop_blit()
         if self.rect is not None:
             self.rect.remove()
             self.rect = None
@@ -156,6 +190,34 @@ class ROISelector:
         self.ax.figure.canvas.draw_idle()
 
 
+def combine_roi_bounds(rois: Sequence[Tuple[int, int, int, int, int]],
+                       volume_shape: Tuple[int, int, int]) -> Tuple[int, int, int, int, int, int]:
+    """
+    Объединяет произвольное число ROI в один 3D бокс, обрезанный по volume.
+    
+    Args:
+        rois: Последовательность ROI вида (z_slice, y_min, y_max, x_min, x_max)
+        volume_shape: Размеры volume (Z, Y, X)
+        
+    Returns:
+        Кортеж (z0, z1, y0, y1, x0, x1)
+        
+    Example:
+        >>> combine_roi_bounds([(10, 50, 200, 40, 220), (80, 60, 210, 30, 230)],
+        ...                    (120, 512, 512))
+        (10, 80, 50, 210, 30, 230)
+    """
+    rois = np.asarray(rois).reshape(-1, 5)
+    
+    # Нижние границы (z, y_min, x_min) и верхние (z, y_max, x_max) по всем ROI
+    low = np.maximum(rois[:, [0, 1, 3]].min(axis=0), 0)
+    high = np.minimum(rois[:, [0, 2, 4]].max(axis=0), np.asarray(volume_shape) - 1)
+    
+    z0, y0, x0 = low.tolist()
+    z1, y1, x1 = high.tolist()
+    return z0, z1, y0, y1, x0, x1
+
+
 class ROIManager:
     """
     Менеджер для управления несколькими ROI.
@@ -163,10 +225,45 @@ class ROIManager:
     Хранит и управляет ROI для различных срезов и проекций.
     """
     
+    __slots__ = ('_rois', '_rois_set')
+    
     def __init__(self):
         """Инициализирует менеджер ROI."""
-        self.roi1_3d: Optional[Tuple[int, int, int, int, int]] = None
-        self.roi2_3d: Optional[Tuple[int, int, int, int, int]] = None
+        # Строка i - ROI i+1 в виде (z_slice, y_min, y_max, x_min, x_max)
+        self._rois = np.zeros((2, 5), dtype=np.int32)
+        self._rois_set = np.zeros(2, dtype=bool)
+    
+    @property
+    def roi1_3d(self) -> Optional[Tuple[int, int, int, int, int]]:
+        """Первый ROI (z_slice, y_min, y_max, x_min, x_max) или None."""
+        return self._get_roi(0)
+    
+    @roi1_3d.setter
+    def roi1_3d(self, roi: Optional[Tuple[int, int, int, int, int]]) -> None:
+        self._set_roi(0, roi)
+    
+    @property
+    def roi2_3d(self) -> Optional[Tuple[int, int, int, int, int]]:
+        """Второй ROI (z_slice, y_min, y_max, x_min, x_max) или None."""
+        return self._get_roi(1)
+    
+    @roi2_3d.setter
+    def roi2_3d(self, roi: Optional[Tuple[int, int, int, int, int]]) -> None:
+        self._set_roi(1, roi)
+    
+    def _get_roi(self, index: int) -> Optional[Tuple[int, int, int, int, int]]:
+        """Возвращает ROI из строки массива в виде кортежа."""
+        if not self._rois_set[index]:
+            return None
+        return tuple(self._rois[index].tolist())
+    
+    def _set_roi(self, index: int, roi: Optional[Tuple[int, int, int, int, int]]) -> None:
+        """Записывает ROI в строку массива (None - сбросить)."""
+        if roi is None:
+            self._rois_set[index] = False
+        else:
+            self._rois[index] = roi
+            self._rois_set[index] = True
     
     def set_roi1(self, z_slice: int, x_min: int, x_max: int, y_min: int, y_max: int) -> None:
         """
@@ -177,7 +274,7 @@ class ROIManager:
             x_min, x_max: Границы по X
             y_min, y_max: Границы по Y
         """
-        self.roi1_3d = (z_slice, y_min, y_max, x_min, x_max)
+        self._set_roi(0, (z_slice, y_min, y_max, x_min, x_max))
     
     def set_roi2(self, z_slice: int, x_min: int, x_max: int, y_min: int, y_max: int) -> None:
         """
@@ -188,16 +285,15 @@ class ROIManager:
             x_min, x_max: Границы по X
             y_min, y_max: Границы по Y
         """
-        self.roi2_3d = (z_slice, y_min, y_max, x_min, x_max)
+        self._set_roi(1, (z_slice, y_min, y_max, x_min, x_max))
     
     def reset(self) -> None:
         """Сбрасывает все ROI."""
-        self.roi1_3d = None
-        self.roi2_3d = None
+        self._rois_set[:] = False
     
     def has_both_rois(self) -> bool:
         """Проверяет, заданы ли оба ROI."""
-        return self.roi1_3d is not None and self.roi2_3d is not None
+        return bool(self._rois_set.all())
     
     def get_combined_roi_coords(self, volume_shape: Tuple[int, int, int]) -> Tuple[int, int, int, int, int, int]:
         """
@@ -215,26 +311,7 @@ class ROIManager:
         if not self.has_both_rois():
             raise ValueError("Оба ROI должны быть заданы")
         
-        z1_slice, y1_0, y1_1, x1_0, x1_1 = self.roi1_3d
-        z2_slice, y2_0, y2_1, x2_0, x2_1 = self.roi2_3d
-        
-        # Объединяем границы
-        x0 = min(x1_0, x2_0)
-        x1 = max(x1_1, x2_1)
-        y0 = min(y1_0, y2_0)
-        y1 = max(y1_1, y2_1)
-        z0 = min(z1_slice, z2_slice)
-        z1 = max(z1_slice, z2_slice)
-        
-        # Обрезаем по границам volume
-        z0 = max(0, z0)
-        z1 = min(volume_shape[0] - 1, z1)
-        y0 = max(0, y0)
-        y1 = min(volume_shape[1] - 1, y1)
-        x0 = max(0, x0)
-        x1 = min(volume_shape[2] - 1, x1)
-        
-        return z0, z1, y0, y1, x0, x1
+        return combine_roi_bounds(self._rois, volume_shape)
     
     def get_info_text(self) -> str:
         """
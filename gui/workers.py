@@ -4,14 +4,20 @@
 Использует QThread для выполнения сегментации и постобработки в фоновом режиме.
 """
 
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Tuple
 from datetime import datetime
 
 import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
 
-from core.processing import refine_mask
+from core.processing import refine_mask, binary_closing_cube, label_parallel
+
+
+# Минимальный интервал между промежуточными сигналами прогресса (сек)
+PROGRESS_MIN_INTERVAL = 0.1
 
 
 class SegmentationWorker(QThread):
@@ -140,8 +146,26 @@ class MaskRefinementWorker(QThread):
         self.base_mask = base_mask
         self.volume = volume
         self.spacing = spacing
-        self.params = params
+        # Собственный снимок параметров: вызывающий код может менять
+        # свой словарь, пока worker работает
+        self.params = dict(params)
         self.organ_key = organ_key
+        self._last_emit = 0.0
+        # Объем вокселя в мл считается один раз
+        self._voxel_volume_ml = float(np.prod(spacing)) / 1000.0
+    
+    def _emit_progress_throttled(self, percentage: int, message: str) -> None:
+        """
+        Испускает progress не чаще раза в PROGRESS_MIN_INTERVAL.
+        
+        Каждый сигнал пересекает границу потоков через очередь событий
+        GUI-потока; на глубоких volume поток промежуточных сообщений
+        только нагружает event loop.
+        """
+        now = time.monotonic()
+        if now - self._last_emit >= PROGRESS_MIN_INTERVAL:
+            self._last_emit = now
+            self.progress.emit(percentage, message)
     
     def run(self) -> None:
         """Выполняет постобработку в отдельном потоке."""
@@ -176,71 +200,124 @@ class MaskRefinementWorker(QThread):
         """
         from scipy import ndimage
         
-        mask = self.base_mask.copy()
+        # Копия не нужна: каждый шаг возвращает новый массив, а срезы
+        # на шаге 4 записываются только в маску, созданную шагом 3
+        mask = self.base_mask
         base_count = int(np.sum(mask))
         
+        # Все ключи результата заданы сразу и заполняются на месте;
+        # params - снимок, принадлежащий worker'у, копировать его не нужно
         stats = {
             'base_count': base_count,
-            'steps': []
+            'steps': [],
+            'final_count': 0,
+            'improvement_percent': 0.0,
+            'volume_ml': 0.0,
+            'params': self.params
         }
         
         # Шаг 1: Расширение по HU (40%)
         if self.params.get('dilation_iter', 0) > 0:
             self.progress.emit(20, f"Расширение по HU [{self.params['hu_min']}, {self.params['hu_max']}]...")
             
-            lung_tissue = ((self.volume >= self.params['hu_min']) &
-                          (self.volume <= self.params['hu_max'])).astype(np.uint8)
-            dilated = ndimage.binary_dilation(mask, iterations=self.params['dilation_iter'])
-            mask = dilated & lung_tissue
+            # Пересечение с легочной тканью по HU прямо в буфере расширенной
+            # маски, без отдельной uint8-маски lung_tissue
+            mask = ndimage.binary_dilation(mask, iterations=self.params['dilation_iter'])
+            np.logical_and(mask, self.volume >= self.params['hu_min'], out=mask)
+            np.logical_and(mask, self.volume <= self.params['hu_max'], out=mask)
         
         # Шаг 2: Морфологическое закрытие (20%)
         if self.params.get('closing_size', 1) > 1:
             self.progress.emit(40, "Морфологическое закрытие...")
-            structure = np.ones((self.params['closing_size'],
-                               self.params['closing_size'],
-                               self.params['closing_size']))
-            mask = ndimage.binary_closing(mask, structure=structure)
+            # OpenCV на срезах, без него - SciPy (плотно или сепарабельно по size)
+            mask = binary_closing_cube(mask, self.params['closing_size'])
         
         # Шаг 3: Удаление шума (20%)
         self.progress.emit(60, "Удаление мелких компонент...")
-        labeled, num_features = ndimage.label(mask)
+        # Разметка параллельно по Z-слоям (как в core.processing)
+        labeled, num_features = label_parallel(mask)
         if num_features > 0:
-            sizes = ndimage.sum(mask, labeled, range(1, num_features + 1))
+            # Размер компоненты - число вхождений ее метки (0 - фон)
+            sizes = np.bincount(labeled.ravel())[1:]
             max_size = np.max(sizes)
             threshold = max_size * 0.01
-            mask_cleaned = np.zeros_like(mask)
-            for i, size in enumerate(sizes, 1):
-                if size > threshold:
-                    mask_cleaned[labeled == i] = 1
-            mask = mask_cleaned
+            # Таблица "оставить/удалить" по метке (0 - фон) и один проход
+            # выборки по labeled вместо прохода на каждую компоненту
+            keep = np.empty(num_features + 1, dtype=bool)
+            keep[0] = False
+            keep[1:] = sizes > threshold
+            mask = keep[labeled]
         
         # Шаг 4: Заполнение дыр (20%)
         if self.params.get('fill_holes', False):
             total_slices = mask.shape[0]
-            for z in range(total_slices):
-                if z % 10 == 0:
+            
+            # Пустые срезы отбрасываются одним векторным проходом,
+            # непустые заполняются параллельно (ndimage отпускает GIL)
+            nonempty_z = np.flatnonzero(mask.reshape(total_slices, -1).any(axis=1))
+            
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                filled_slices = executor.map(ndimage.binary_fill_holes,
+                                             (mask[z] for z in nonempty_z))
+                for z, filled in zip(nonempty_z, filled_slices):
                     progress_pct = 80 + int((z / total_slices) * 15)
-                    self.progress.emit(progress_pct, f"Заполнение дыр: {z}/{total_slices}")
-                if np.any(mask[z]):
-                    mask[z] = ndimage.binary_fill_holes(mask[z])
+                    self._emit_progress_throttled(progress_pct, f"Заполнение дыр: {z}/{total_slices}")
+                    mask[z] = filled
         
         self.progress.emit(95, "Финализация...")
         
-        mask = mask.astype(np.uint8)
-        final_count = int(np.sum(mask))
+        if mask.dtype == np.bool_ and mask is not self.base_mask:
+            # bool и uint8 совпадают побайтно: view вместо копии
+            final_count = int(np.count_nonzero(mask))
+            mask = mask.view(np.uint8)
+        else:
+            mask = mask.astype(np.uint8)
+            final_count = int(np.sum(mask))
         improvement = ((final_count - base_count) / base_count * 100) if base_count > 0 else 0
-        volume_ml = final_count * np.prod(self.spacing) / 1000.0
         
-        stats.update({
-            'final_count': final_count,
-            'improvement_percent': improvement,
-            'volume_ml': volume_ml,
-            'params': self.params.copy()
-        })
+        stats['final_count'] = final_count
+        stats['improvement_percent'] = improvement
+        stats['volume_ml'] = final_count * self._voxel_volume_ml
         
         return mask, stats
 
 
+class ModelPreloadWorker(QThread):
+    """
+    Worker для фоновой загрузки и прогрева модели при старте приложения.
+    
+    Signals:
+        finished: Испускается когда модель готова (model_instance)
+        error: Испускается при ошибке (error_message)
+    """
+    
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    
+    def __init__(self, model_instance: object):
+        """
+        Инициализирует worker предзагрузки.
+        
+        Args:
+            model_instance: Экземпляр модели сегментации (BaseSegmenter)
+        """
+        super().__init__()
+        self.model = model_instance
+    
+    def run(self) -> None:
+        """Загружает веса и выполняет пробный прогон в отдельном потоке."""
+        try:
+            if hasattr(self.model, 'warmup'):
+                self.model.warmup()
+            else:
+                self.model.load_model()
+            
+            self.finished.emit(self.model)
+            
+        except Exception as e:
+            self.error.emit(str(e))
+
+
 class DataLoadWorker(QThread):
     """
     Worker для асинхронной загрузки DICOM.
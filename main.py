@@ -4,14 +4,47 @@ Medical Imaging Viewer с ролевой моделью User/Admin
 """
 
 import sys
+import logging
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import Qt
 from gui.main_window import MainWindow
 
 
+def _start_model_preload(main_window):
+    """
+    Запускает фоновую загрузку модели lungmask.
+    
+    Веса и CUDA-контекст инициализируются, пока пользователь загружает
+    данные. Загруженная модель попадает в общий кеш
+    LungMaskSegmenter._INFERER_CACHE, поэтому любой экземпляр с той же
+    моделью и устройством при сегментации не загружает веса повторно.
+    """
+    try:
+        from models.lungmask_segmenter import LungMaskSegmenter
+        from gui.workers import ModelPreloadWorker
+    except ImportError as e:
+        print(f"[WARNING] Предзагрузка модели недоступна: {e}")
+        return
+    
+    segmenter = LungMaskSegmenter(use_cpu=False)
+    worker = ModelPreloadWorker(segmenter)
+    
+    def on_error(message):
+        print(f"[WARNING] Не удалось предзагрузить модель: {message}")
+    
+    worker.error.connect(on_error)
+    
+    # Храним ссылку, чтобы поток не был удален сборщиком мусора
+    main_window._preload_worker = worker
+    worker.start()
+
+
 def main():
     """Главная функция запуска приложения"""
     
+    # Отладочные сообщения (переходы состояний UI и т.п.) выключены
+    logging.basicConfig(level=logging.INFO)
+    
     # Создание приложения
     app = QApplication(sys.argv)
     app.setApplicationName("lung1122")
@@ -24,6 +57,9 @@ def main():
     main_window = MainWindow()
     main_window.show()
     
+    # Загрузка модели сегментации в фоне
+    _start_model_preload(main_window)
+    
     # Запуск event loop
     sys.exit(app.exec_())
 
@@ -5,7 +5,9 @@
 другими моделями без изменения основного кода.
 """
 
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Dict, Any, Optional
 import numpy as np
 import SimpleITK as sitk
@@ -14,6 +16,10 @@ import torch
 from models.base_model import BaseSegmenter
 
 
+# Минимальный интервал между сообщениями о прогрессе батчей (сек)
+BATCH_PROGRESS_MIN_INTERVAL = 0.1
+
+
 class LungMaskSegmenter(BaseSegmenter):
     """
     Сегментация лёгких с использованием lungmask.
@@ -25,10 +31,15 @@ class LungMaskSegmenter(BaseSegmenter):
     display_name: str = "Сегментация лёгких (LungMask)"
     organ_key: str = "lung"
     
+    # Загруженные модели, общие для всех экземпляров: (model_name, device) -> LMInferer
+    _INFERER_CACHE: Dict[Tuple[str, str], Any] = {}
+    _INFERER_CACHE_LOCK = threading.Lock()
+    
     def __init__(self, 
                  use_cpu: bool = False,
                  model_name: str = "R231CovidWeb",
                  batch_size: int = 20,
+                 use_fp16: bool = True,
                  **kwargs):
         """
         Инициализирует модель lungmask.
@@ -37,29 +48,49 @@ class LungMaskSegmenter(BaseSegmenter):
             use_cpu: Принудительно использовать CPU
             model_name: Название модели lungmask ('R231CovidWeb', 'LTRCLobes', etc.)
             batch_size: Размер батча для обработки больших volume
+            use_fp16: Инференс в float16 (autocast) при работе на GPU
             **kwargs: Дополнительные параметры
         """
         super().__init__(use_cpu=use_cpu, **kwargs)
         self.model_name = model_name
         self.batch_size = batch_size
+        self.use_fp16 = use_fp16
         self._inferer = None
     
     def load_model(self) -> None:
         """
         Загружает модель lungmask.
         
+        Модель, уже загруженная для того же (model_name, device) любым
+        экземпляром, берется из кеша класса без повторной загрузки весов.
+        
         Raises:
             ImportError: Если lungmask не установлен
             RuntimeError: Если не удалось загрузить модель
         """
+        cache_key = (self.model_name, self.device)
+        
         try:
-            from lungmask import LMInferer
+            with self._INFERER_CACHE_LOCK:
+                cached = self._INFERER_CACHE.get(cache_key)
+                if cached is not None:
+                    self._inferer = cached
+                    return
+                
+                from lungmask import LMInferer
+                
+                print(f"[INFO] Загрузка lungmask модели: {self.model_name}")
+                self._inferer = LMInferer(
+                    modelname=self.model_name,
+                    force_cpu=self.use_cpu
+                )
+                self._INFERER_CACHE[cache_key] = self._inferer
+            
+            # Размер срезов после ресемплинга lungmask фиксирован -
+            # cuDNN один раз подбирает самый быстрый алгоритм свертки
+            if not self.use_cpu:
+                torch.backends.cudnn.benchmark = True
             
-            print(f"[INFO] Загрузка lungmask модели: {self.model_name}")
-            self._inferer = LMInferer(
-                modelname=self.model_name,
-                force_cpu=self.use_cpu
-            )
             print(f"[INFO] Модель загружена на {self.device.upper()}")
             
         except ImportError:
@@ -69,6 +100,27 @@ class LungMaskSegmenter(BaseSegmenter):
         except Exception as e:
             raise RuntimeError(f"Не удалось загрузить модель lungmask: {e}")
     
+    def warmup(self) -> None:
+        """
+        Загружает модель и прогревает GPU пробным прогоном.
+        
+        Первый инференс на CUDA платит за создание контекста и подбор
+        алгоритмов cuDNN; пробный прогон на маленьком volume переносит эти
+        затраты на момент запуска приложения.
+        """
+        if self._inferer is None:
+            self.load_model()
+        
+        if self.device != 'cuda':
+            return
+        
+        try:
+            dummy = sitk.GetImageFromArray(np.full((32, 128, 128), -1024, dtype=np.int16))
+            self._apply_inferer(dummy)
+            torch.cuda.synchronize()
+        except Exception as e:
+            print(f"[WARNING] Прогрев модели не удался: {e}")
+    
     def segment(self,
                 volume: np.ndarray,
                 spacing: Tuple[float, float, float],
@@ -101,15 +153,16 @@ class LungMaskSegmenter(BaseSegmenter):
         if self._inferer is None:
             self.load_model()
         
-        # Препроцессинг - извлечение ROI если задан
+        # Препроцессинг - извлечение ROI если задан.
+        # GetImageFromArray сам копирует данные, поэтому своя копия не
+        # нужна - только непрерывность памяти (без копии, если уже так)
         if roi_coords is not None:
             z0, z1, y0, y1, x0, x1 = roi_coords
-            roi_volume = volume[z0:z1+1, y0:y1+1, x0:x1+1].copy()
-            process_volume = roi_volume
+            process_volume = np.ascontiguousarray(volume[z0:z1+1, y0:y1+1, x0:x1+1])
         else:
             z0 = y0 = x0 = 0
             z1, y1, x1 = volume.shape[0]-1, volume.shape[1]-1, volume.shape[2]-1
-            process_volume = volume.copy()
+            process_volume = np.ascontiguousarray(volume)
         
         if progress_callback:
             progress_callback(10, f"Подготовка данных: {process_volume.shape}")
@@ -216,6 +269,26 @@ class LungMaskSegmenter(BaseSegmenter):
         else:
             if progress_callback:
                 progress_callback(25, f"Сегментация {n_slices} срезов")
+            return self._apply_inferer(sitk_image)
+    
+    def _apply_inferer(self, sitk_image: sitk.Image) -> np.ndarray:
+        """
+        Запускает lungmask на изображении.
+        
+        Прямой проход выполняется в inference_mode (без учета градиентов).
+        На GPU при use_fp16 дополнительно включается autocast в float16:
+        карты признаков занимают вдвое меньше видеопамяти.
+        
+        Args:
+            sitk_image: SimpleITK изображение
+            
+        Returns:
+            Массив сегментации
+        """
+        with torch.inference_mode():
+            if self.use_fp16 and self.device == 'cuda':
+                with torch.autocast(device_type='cuda', dtype=torch.float16):
+                    return self._inferer.apply(sitk_image)
             return self._inferer.apply(sitk_image)
     
     def _batch_segment(self,
@@ -241,17 +314,12 @@ class LungMaskSegmenter(BaseSegmenter):
         
         n_batches = (n_slices + self.batch_size - 1) // self.batch_size
         
-        for batch_idx in range(n_batches):
+        def prepare_batch(batch_idx: int) -> Tuple[int, int, sitk.Image]:
+            """Вырезает батч и оборачивает его в SimpleITK изображение."""
             i = batch_idx * self.batch_size
             end_i = min(i + self.batch_size, n_slices)
             
-            if progress_callback:
-                progress = 30 + int((batch_idx / n_batches) * 60)
-                progress_callback(progress, f"Батч {batch_idx+1}/{n_batches}: срезы {i}-{end_i}")
-            
-            # Извлекаем батч
-            batch = roi_array[i:end_i]
-            batch_sitk = sitk.GetImageFromArray(batch)
+            batch_sitk = sitk.GetImageFromArray(roi_array[i:end_i])
             batch_sitk.SetSpacing(orig_spacing)
             batch_sitk.SetDirection(orig_direction)
             
@@ -260,9 +328,33 @@ class LungMaskSegmenter(BaseSegmenter):
             batch_origin[2] = orig_origin[2] + i * orig_spacing[2]
             batch_sitk.SetOrigin(batch_origin)
             
-            # Сегментация батча
-            batch_seg = self._inferer.apply(batch_sitk)
-            result[i:end_i] = batch_seg
+            return i, end_i, batch_sitk
+        
+        last_emit = None
+        
+        # Конвейер: следующий батч готовится в фоновом потоке,
+        # пока модель обрабатывает текущий
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            next_batch = executor.submit(prepare_batch, 0)
+            
+            for batch_idx in range(n_batches):
+                i, end_i, batch_sitk = next_batch.result()
+                if batch_idx + 1 < n_batches:
+                    next_batch = executor.submit(prepare_batch, batch_idx + 1)
+                
+                # apply() синхронный (возвращает numpy), поэтому время на
+                # хосте точно отражает работу GPU; быстрые батчи подряд
+                # не засыпают GUI сообщениями
+                now = time.monotonic()
+                if progress_callback and (last_emit is None or
+                                          now - last_emit >= BATCH_PROGRESS_MIN_INTERVAL):
+                    last_emit = now
+                    progress = 30 + int((batch_idx / n_batches) * 60)
+                    progress_callback(progress, f"Батч {batch_idx+1}/{n_batches}: срезы {i}-{end_i}")
+                
+                # Сегментация батча
+                batch_seg = self._apply_inferer(batch_sitk)
+                result[i:end_i] = batch_seg
         
         return result
     
@@ -276,6 +368,7 @@ class LungMaskSegmenter(BaseSegmenter):
         info.update({
             'model_name': self.model_name,
             'batch_size': self.batch_size,
+            'use_fp16': self.use_fp16,
             'supports_batching': True
         })
         return info
\ No newline at end of file